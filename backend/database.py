@@ -1,31 +1,59 @@
 import os
-from functools import lru_cache
 from pathlib import Path
 
+import asyncpg
 from dotenv import load_dotenv
-from supabase import Client, create_client
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT_DIR / ".env")
 
 
 class Settings:
-    supabase_url: str
-    supabase_service_key: str
+    supabase_db_url: str
 
     def __init__(self) -> None:
-        self.supabase_url = os.getenv("SUPABASE_URL", "")
-        self.supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY", "")
-        if not self.supabase_url or not self.supabase_service_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+        self.supabase_db_url = os.getenv("SUPABASE_DB_URL", "")
+        if not self.supabase_db_url:
+            raise ValueError("SUPABASE_DB_URL must be set")
+
+
+# Built at import so a missing SUPABASE_DB_URL aborts before uvicorn binds
+# the port, and forked workers inherit the parsed settings instead of each
+# re-reading .env on first request
+SETTINGS = Settings()
 
 
-@lru_cache
 def get_settings() -> Settings:
-    return Settings()
+    return SETTINGS
+
+
+_pool: asyncpg.Pool | None = None
 
 
-@lru_cache
-def get_supabase_client() -> Client:
+async def create_pool() -> asyncpg.Pool:
+    """Create the shared connection pool. Called once at app startup."""
+    global _pool
     settings = get_settings()
-    return create_client(settings.supabase_url, settings.supabase_service_key)
+    _pool = await asyncpg.create_pool(
+        dsn=settings.supabase_db_url,
+        min_size=2,
+        max_size=10,
+        max_inactive_connection_lifetime=1800,
+        # Supabase's Supavisor pooler does not support asyncpg's
+        # prepared-statement cache
+        statement_cache_size=0,
+    )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("Database pool is not initialized")
+    return _pool
@@ -1,21 +1,64 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
-from decimal import Decimal
+import hashlib
 import os
 import logging
-from typing import Any
+import threading
+from typing import Any, AsyncIterator
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 
-from backend.database import get_supabase_client
-from backend.models import ItemHistoryResponse, ItemSummary, PricePoint
+from backend.database import close_pool, create_pool, get_pool
+from backend.models import ItemSummary
+
+# Validating the whole list in one pydantic-core call is much cheaper than
+# constructing N models in a Python loop
+_ITEMS_ADAPTER = TypeAdapter(list[ItemSummary])
 
 logger = logging.getLogger(__name__)
 
 STORE_NAME = "JayaGrocer"
-ZERO = Decimal("0")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+# Lets browsers and CDNs short-circuit repeat polls: fresh for 30s, revalidate
+# (via ETag) for another 60s while serving stale
+CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+
+# Prices only change at scrape cadence, so repeated dashboard polls can be
+# served from memory instead of hitting Supabase every time.
+_response_cache: TTLCache = TTLCache(maxsize=256, ttl=CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key: str) -> Any:
+    with _cache_lock:
+        return _response_cache.get(key)
+
 
-app = FastAPI(title="Price Tracker API", version="1.0.0")
+def _cache_set(key: str, value: Any) -> None:
+    with _cache_lock:
+        _response_cache[key] = value
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await create_pool()
+    try:
+        yield
+    finally:
+        await close_pool()
+
+
+app = FastAPI(
+    title="Price Tracker API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 allowed_origins = os.getenv(
     "CORS_ORIGINS",
@@ -31,10 +74,10 @@ app.add_middleware(
 )
 
 
-def _to_decimal(value: object) -> Decimal:
+def _to_float(value: object) -> float:
     if value is None:
-        return ZERO
-    return Decimal(str(value))
+        return 0.0
+    return float(value)
 
 
 def _to_datetime(value: object) -> datetime:
@@ -45,7 +88,7 @@ def _to_datetime(value: object) -> datetime:
     return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
-def _direction(current_price: Decimal, previous_price: Decimal | None) -> str:
+def _direction(current_price: float, previous_price: float | None) -> str:
     if previous_price is None:
         return "new"
     if current_price > previous_price:
@@ -55,44 +98,27 @@ def _direction(current_price: Decimal, previous_price: Decimal | None) -> str:
     return "same"
 
 
-def _group_latest_and_previous_different(rows: list[dict[str, Any]]) -> dict[int, list[dict[str, Any]]]:
-    grouped: dict[int, list[dict[str, Any]]] = {}
-    latest_price: dict[int, Decimal] = {}
-    for row in rows:
-        product_id = int(row["product_id"])
-        price = _to_decimal(row["price"])
-        if product_id not in grouped:
-            grouped[product_id] = [row]
-            latest_price[product_id] = price
-        elif len(grouped[product_id]) < 2 and price != latest_price[product_id]:
-            grouped[product_id].append(row)
-    return grouped
-
-
-def _build_item_summary(product: dict[str, Any], product_history: list[dict[str, Any]]) -> ItemSummary:
-    latest = product_history[0]
-    previous = product_history[1] if len(product_history) > 1 else None
-
-    current_price = _to_decimal(latest["price"])
-    previous_price = _to_decimal(previous["price"]) if previous else None
-    price_change = current_price - previous_price if previous_price is not None else ZERO
+def _build_item_summary(row: dict[str, Any]) -> dict[str, Any]:
+    current_price = _to_float(row["current_price"])
+    previous_price = _to_float(row["previous_price"]) if row["previous_price"] is not None else None
+    price_change = current_price - previous_price if previous_price is not None else 0.0
 
     if previous_price is None or previous_price == 0:
         percent_change = None
     else:
-        percent_change = (price_change / previous_price) * Decimal("100")
-
-    return ItemSummary(
-        id=int(product["id"]),
-        product_name=str(product["name"]),
-        store=STORE_NAME,
-        current_price=float(current_price),
-        previous_price=float(previous_price) if previous_price is not None else None,
-        price_change=float(price_change),
-        percent_change=float(percent_change) if percent_change is not None else None,
-        direction=_direction(current_price, previous_price),
-        last_updated=_to_datetime(latest["scraped_at"]),
-    )
+        percent_change = (price_change / previous_price) * 100.0
+
+    return {
+        "id": row["id"],
+        "product_name": row["name"],
+        "store": STORE_NAME,
+        "current_price": current_price,
+        "previous_price": previous_price,
+        "price_change": price_change,
+        "percent_change": percent_change,
+        "direction": _direction(current_price, previous_price),
+        "last_updated": _to_datetime(row["last_updated"]),
+    }
 
 
 @app.get("/health")
@@ -101,78 +127,79 @@ def health() -> dict[str, str]:
 
 
 @app.get("/items", response_model=list[ItemSummary])
-def get_items() -> list[ItemSummary]:
-    try:
-        supabase = get_supabase_client()
-
-        products_result = (
-            supabase.table("products")
-            .select("id, name, url")
-            .order("name", desc=False)
-            .execute()
-        )
-        products = products_result.data or []
-
-        history_result = (
-            supabase.table("price_history")
-            .select("product_id, price, scraped_at")
-            .order("scraped_at", desc=True)
-            .execute()
-        )
-        rows = history_result.data or []
-        history_by_product = _group_latest_and_previous_different(rows)
-
-        items: list[ItemSummary] = []
-        for product in products:
-            product_id = int(product["id"])
-            product_history = history_by_product.get(product_id, [])
-
-            if not product_history:
-                continue
-            items.append(_build_item_summary(product, product_history))
-
-        return items
-    except Exception as e:
-        logger.exception("GET /items failed")
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.get("/history/{item_id}", response_model=ItemHistoryResponse)
-def get_history(item_id: int) -> ItemHistoryResponse:
-    supabase = get_supabase_client()
-
-    product_result = (
-        supabase.table("products")
-        .select("id, name")
-        .eq("id", item_id)
-        .limit(1)
-        .execute()
+async def get_items(request: Request) -> Response:
+    cached = _cache_get("items")
+    if cached is None:
+        try:
+            async with get_pool().acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT id, name, current_price, previous_price, last_updated"
+                    " FROM items_summary()"
+                )
+
+            payload = [
+                _build_item_summary(row)
+                for row in rows
+                if row["current_price"] is not None
+            ]
+            _ITEMS_ADAPTER.validate_python(payload)
+
+            body = orjson.dumps(payload)
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            cached = (body, etag)
+            _cache_set("items", cached)
+        except Exception as e:
+            logger.exception("GET /items failed")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# The whole response shape is aggregated in SQL so the handler never builds
+# N Python objects for long histories; the bytes go out exactly as Postgres
+# produced them.
+_HISTORY_JSON_SQL = """
+SELECT jsonb_build_object(
+    'id', p.id,
+    'product_name', p.name,
+    'store', $2::text,
+    'history', COALESCE(
+        (SELECT jsonb_agg(
+             jsonb_build_object('price', ph.price, 'scraped_at', ph.scraped_at)
+             ORDER BY ph.scraped_at
+         )
+         FROM price_history ph
+         WHERE ph.product_id = p.id),
+        '[]'::jsonb
     )
+)::text
+FROM products p
+WHERE p.id = $1
+"""
+
 
-    product_rows = product_result.data or []
-    if not product_rows:
+@app.get("/history/{item_id}")
+async def get_history(item_id: int) -> Response:
+    cached = _cache_get(f"history:{item_id}")
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    async with get_pool().acquire() as conn:
+        body = await conn.fetchval(_HISTORY_JSON_SQL, item_id, STORE_NAME)
+
+    if body is None:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    product = product_rows[0]
+    _cache_set(f"history:{item_id}", body)
+    return Response(content=body, media_type="application/json")
 
-    history_result = (
-        supabase.table("price_history")
-        .select("price, scraped_at")
-        .eq("product_id", item_id)
-        .order("scraped_at", desc=False)
-        .execute()
-    )
-    history_rows = history_result.data or []
-
-    return ItemHistoryResponse(
-        id=int(product["id"]),
-        product_name=str(product["name"]),
-        store=STORE_NAME,
-        history=[
-            PricePoint(
-                price=float(_to_decimal(row["price"])),
-                scraped_at=_to_datetime(row["scraped_at"]),
-            )
-            for row in history_rows
-        ],
-    )
+
+@app.post("/cache/invalidate")
+def invalidate_cache() -> dict[str, str]:
+    with _cache_lock:
+        _response_cache.clear()
+    return {"status": "ok"}
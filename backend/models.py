@@ -14,15 +14,3 @@ class ItemSummary(BaseModel):
     percent_change: float | None
     direction: Literal["up", "down", "same", "new"]
     last_updated: datetime
-
-
-class PricePoint(BaseModel):
-    price: float
-    scraped_at: datetime
-
-
-class ItemHistoryResponse(BaseModel):
-    id: int
-    product_name: str
-    store: str
-    history: list[PricePoint]
@@ -6,21 +6,36 @@ Monitors prices from Jayagrocer Malaysia and sends Telegram alerts on price chan
 """
 
 import os
-import json
 import logging
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from functools import lru_cache
 import sys
 import asyncio
+import random
 import re
-from decimal import Decimal
+import time
 from typing import Optional, Dict, List
-from datetime import datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
+import asyncpg
 import httpx
-from supabase import create_client, Client
+import numpy as np
+import orjson
+from aiolimiter import AsyncLimiter
 from crawl4ai import AsyncWebCrawler
+from selectolax.parser import HTMLParser
 import gspread
 from google.oauth2.service_account import Credentials
-from bs4 import BeautifulSoup
+
+# uvloop is optional (and unavailable on Windows); when present, asyncio.run
+# picks it up automatically for the scrape/alert pipeline
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 
 # Configure logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -30,19 +45,86 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Most product pages carry the price in a machine-readable JSON-LD/OpenGraph
+# blob, so try cheap regexes on the raw HTML before building a DOM
+_PRICE_JSONLD_RE = re.compile(r'"price"\s*:\s*"?(\d+(?:\.\d+)?)"?', re.ASCII)
+_PRICE_RM_RE = re.compile(r'RM\s*(\d+(?:\.\d+)?)', re.IGNORECASE | re.ASCII)
+
+# Strips currency markers, separators and whitespace (incl. no-break space)
+# from a displayed price in one C-level pass
+_STRIP_CURRENCY = str.maketrans('', '', 'RM, \t\n\r\u00a0')
+
+# Browser-like UA for the static fast path; some storefronts 403 obvious bots
+_SCRAPE_UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    " (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+# Smallest absolute price difference (in RM) treated as a real change; masks
+# float representation noise below one sen
+MIN_PRICE_DIFF = 0.01
+
+# Within this fraction of the last alerted price, a repeat alert inside the
+# cooldown window is considered noise
+COOLDOWN_PRICE_TOLERANCE = 0.01
+
+@lru_cache(maxsize=1)
+def _load_sheets_credentials(creds_json: str) -> Credentials:
+    """Parse the service-account JSON and build credentials once per process."""
+    return Credentials.from_service_account_info(
+        orjson.loads(creds_json),
+        scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
+    )
+
+
+def _extract_price(html: str) -> Optional[float]:
+    """Pull a product price out of page HTML."""
+    # Placeholder zeros ("price": "0", RM 0) show up on partially rendered
+    # and out-of-stock pages; treat them as a miss so the next strategy (and
+    # ultimately the browser fallback) gets a chance
+    m = _PRICE_JSONLD_RE.search(html)
+    if m:
+        price = float(m.group(1))
+        if price > 0:
+            return price
+
+    m = _PRICE_RM_RE.search(html)
+    if m:
+        price = float(m.group(1))
+        if price > 0:
+            return price
+
+    # Pages with no RM marker at all (error pages, login redirects) cannot
+    # yield a displayed price, so skip the DOM parse outright; the slice
+    # bounds the scan on pathologically large pages
+    if 'RM' not in html[:200_000]:
+        return None
+
+    tree = HTMLParser(html)
+    for node in tree.css('.price'):
+        cleaned = node.text(strip=True).translate(_STRIP_CURRENCY)
+        if not cleaned:
+            continue
+        try:
+            price = float(cleaned)
+        except ValueError:
+            continue
+        if price > 0:
+            return price
+    return None
+
 
 class GroceryPriceSentinel:
     """Main class for price monitoring and alerting."""
     
     def __init__(self):
         """Initialize with environment variables."""
-        # Supabase configuration
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
-        
-        self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+        # Direct Postgres DSN (Supavisor session pooler); all DB access goes
+        # over asyncpg
+        self.supabase_db_url = os.getenv("SUPABASE_DB_URL")
+        if not self.supabase_db_url:
+            raise ValueError("SUPABASE_DB_URL must be set")
+        self._pool: Optional[asyncpg.Pool] = None
         
         # Telegram configuration
         self.telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -56,6 +138,10 @@ class GroceryPriceSentinel:
         
         if not self.sheets_id:
             raise ValueError("GOOGLE_SHEETS_ID must be set")
+
+        # Worksheet handle is resolved once and reused; open_by_key costs a
+        # metadata round trip per call
+        self._sheet = None
         
         try:
             creds_json = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
@@ -63,14 +149,7 @@ class GroceryPriceSentinel:
             if not creds_json:
                 raise ValueError("GOOGLE_SERVICE_ACCOUNT_JSON must be set")
 
-            creds_dict = json.loads(creds_json)
-            
-            creds = Credentials.from_service_account_info(
-                creds_dict,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-
-            self.gc = gspread.authorize(creds)
+            self.gc = gspread.authorize(_load_sheets_credentials(creds_json))
         
         except Exception as e:
             raise ValueError(f"Error initializing Google Sheets client: {e}")
@@ -78,152 +157,331 @@ class GroceryPriceSentinel:
         # Price change threshold (minimum percentage change to trigger alert)
         min_pct_str = os.getenv("MIN_PCT_CHANGE")
         self.min_pct_change = float(min_pct_str) if min_pct_str else 0.01
+
+        # Noisy prices that oscillate around a threshold would otherwise
+        # alert on every cycle; suppress repeats near the last alerted price
+        # for this long
+        self.alert_cooldown = float(os.getenv("ALERT_COOLDOWN_SECONDS", "300"))
+
+        # Optional dashboard API base URL; used to flush its response cache
+        # as soon as new prices are written
+        self.backend_base_url = os.getenv("BACKEND_BASE_URL", "").rstrip("/")
+
+        # Per-domain politeness: at most two in-flight requests per host and
+        # a jittered minimum gap between consecutive hits, so the batched
+        # scrape doesn't trip the store's rate limiting
+        self._domain_delay = float(os.getenv("SCRAPE_DOMAIN_DELAY", "1.5"))
+        self._domain_sems: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(2)
+        )
+        self._domain_last_hit: Dict[str, float] = {}
+
+        # One keep-alive connection to api.telegram.org shared by every alert
+        # in a run, instead of a fresh TCP+TLS handshake per message
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
+
+        # Separate keep-alive client for product pages: Jayagrocer renders
+        # prices server-side, so most scrapes are a plain GET with no browser
+        self._scrape_http = httpx.AsyncClient(
+            http2=True,
+            timeout=10,
+            follow_redirects=True,
+            headers={"User-Agent": _SCRAPE_UA},
+        )
+
+        # Telegram allows ~30 msg/s bot-wide and ~1 msg/s per chat; pacing
+        # proactively beats burning round trips on 429 retries
+        self._tg_bot_limiter = AsyncLimiter(25, 1)
+        self._tg_chat_limiter = AsyncLimiter(1, 1)
     
-    def sync_products_from_sheets(self) -> None:
-        """Sync products from Google Sheets into Supabase."""
+    async def sync_products_from_sheets(self) -> List[tuple]:
+        """Sync products from Google Sheets into Supabase.
+
+        Returns (name, url) pairs for products seen for the first time, so the
+        caller can alert on them from the async pipeline.
+        """
         logger.info(f"Syncing products from Google Sheets (ID: {self.sheets_id}, Tab: {self.sheets_tab})")
-        
+
         try:
-            sheet = self.gc.open_by_key(self.sheets_id).worksheet(self.sheets_tab)
-            rows = sheet.get_all_records()
-            
-            synced_count = 0
-            skipped_count = 0
-            
-            for row in rows:
-                item_name = str(row.get("item", "")).strip()
-                raw_url = row.get("url")
+            if self._sheet is None:
+                self._sheet = self.gc.open_by_key(self.sheets_id).worksheet(self.sheets_tab)
+
+            # get_values returns the raw 2D list from a single API call;
+            # get_all_records would rebuild a dict per row with header
+            # lookups, which drags as the sheet grows
+            values = self._sheet.get_values()
+            if not values:
+                logger.info("Sync complete: 0 products synced, 0 skipped")
+                return []
 
-                if raw_url is None:
-                    raw_url = ""
+            header = values[0]
+            try:
+                idx_item = header.index("item")
+                idx_url = header.index("url")
+            except ValueError:
+                raise ValueError(f"Sheet is missing 'item' or 'url' column: {header}")
+
+            products: Dict[str, str] = {}  # url -> name, last sheet row wins
+            skipped_count = 0
 
-                url = str(raw_url).strip()
+            for row in values[1:]:
+                item_name = str(row[idx_item] if idx_item < len(row) else "").strip()
+                url = str(row[idx_url] if idx_url < len(row) else "").strip()
 
                 if not url:
                     logger.warning(f"Skipping row with missing URL: {row}")
                     skipped_count += 1
                     continue
-                
+
                 if not item_name:
                     logger.warning(f"Skipping row with missing item name for URL: {url}")
                     skipped_count += 1
                     continue
-                
-                # Upsert product by URL
-                try:
-                    # Check if product exists
-                    existing = self.supabase.table("products").select("id, name").eq("url", url).execute()
-                    
-                    if existing.data:
-                        # Update if name changed
-                        product_id = existing.data[0]["id"]
-                        if existing.data[0]["name"] != item_name:
-                            self.supabase.table("products").update({"name": item_name}).eq("id", product_id).execute()
-                            logger.info(f"Updated product: {item_name} ({url})")
-                        else:
-                            logger.debug(f"Product already exists: {item_name}")
-                    else:
-                        # Insert new product
-                        self.supabase.table("products").insert({
-                            "name": item_name,
-                            "url": url
-                        }).execute()
-                        logger.info(f"Added new product: {item_name} ({url})")
-
-                        # Telegram alert for new product
-                        self.send_new_product_alert(item_name, url)
-                    
-                    synced_count += 1
-                except Exception as e:
-                    logger.error(f"Error upserting product {item_name} ({url}): {e}")
-                    skipped_count += 1
-            
-            logger.info(f"Sync complete: {synced_count} products synced, {skipped_count} skipped")
-        
+
+                products[url] = item_name
+
+            if not products:
+                logger.info(f"Sync complete: 0 products synced, {skipped_count} skipped")
+                return []
+
+            # One batched upsert keyed on the unique url column; xmax = 0
+            # distinguishes fresh inserts so new products can be alerted on
+            # without a separate existence query
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                result = await conn.fetch(
+                    "INSERT INTO products (name, url)"
+                    " SELECT name, url FROM unnest($1::text[], $2::text[]) AS t(name, url)"
+                    " ON CONFLICT (url) DO UPDATE SET name = EXCLUDED.name"
+                    " RETURNING url, (xmax = 0) AS inserted",
+                    list(products.values()), list(products),
+                )
+            new_urls = {row["url"] for row in result if row["inserted"]}
+
+            new_products = [
+                (name, url) for url, name in products.items() if url in new_urls
+            ]
+            for name, url in new_products:
+                logger.info(f"Added new product: {name} ({url})")
+
+            logger.info(f"Sync complete: {len(products)} products synced, {skipped_count} skipped")
+            return new_products
+
         except Exception as e:
             logger.error(f"Error syncing from Google Sheets: {e}")
             raise
     
-    def fetch_price(self, url: str) -> Optional[Decimal]:
-        """Fetch current price from Jayagrocer product page using Crawl4AI."""
+    async def _get_pool(self) -> asyncpg.Pool:
+        """Lazily create the shared asyncpg pool on first use."""
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                dsn=self.supabase_db_url,
+                min_size=2,
+                max_size=10,
+                max_inactive_connection_lifetime=300,
+                # Required for Supavisor/pgbouncer compatibility
+                statement_cache_size=0,
+            )
+        return self._pool
+
+    async def _fetch_static(self, url: str, etag: Optional[str],
+                            last_modified: Optional[str]) -> Optional[Dict]:
+        """Fast path: fetch the page with a conditional HTTP GET, no browser.
+
+        Returns {"unchanged": True} on 304, a result dict with the price and
+        fresh validators on a parsed 200, or None to fall back to the browser.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            response = await self._scrape_http.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.debug(f"Static fetch failed for {url}: {e}")
+            return None
+
+        if response.status_code == 304:
+            return {"unchanged": True}
+
+        if response.status_code != 200 or not response.text:
+            return None
+
+        # Parsing is pure CPU; push it off the event loop so concurrent
+        # fetches keep making network progress
+        price = await asyncio.to_thread(_extract_price, response.text)
+        if price is None:
+            return None
+
+        return {
+            "price": price,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+
+    async def fetch_price(self, get_crawler, url: str, etag: Optional[str] = None,
+                          last_modified: Optional[str] = None) -> Optional[Dict]:
+        """Fetch current price from a Jayagrocer product page.
+
+        Tries the static fast path first — product pages carry the price in
+        server-side HTML, so a ~100 ms GET usually suffices — and only falls
+        back to the shared Chromium crawler when that yields nothing.
+        """
         logger.debug(f"Fetching price from: {url}")
-        
+
         try:
-            async def scrape_price():
-                async with AsyncWebCrawler(verbose=False) as crawler:
-                    result = await crawler.arun(url=url)
-                    
-                    if not result.success or not result.html:
-                        logger.warning(f"Failed to fetch page: {url}")
-                        return None
-                    
-                    
-                    soup = BeautifulSoup(result.html, 'html.parser')
-                    
-                    h1 = soup.find("h1")
-
-                    if not h1:
-                        logger.warning("No H1 product title found")
-                        return None
-                    
-                    price_el = h1.find_next("span",class_="price")
-
-                    if not price_el:
-                        logger.warning(f"No price found after H1 for {url}")
-                        return None
-
-                    raw_price = price_el.get_text(strip=True)
-                    price_text = raw_price.replace("RM", "").replace(",", "").strip()
-
-                    return Decimal(price_text)
-
-
-            # Run async function
-            import asyncio
-            return asyncio.run(scrape_price())
-        
+            result = await self._fetch_static(url, etag, last_modified)
+            if result is not None:
+                return result
+
+            logger.debug(f"Static fetch found no price for {url}, using browser")
+            crawler = await get_crawler()
+            crawl = await crawler.arun(url=url)
+
+            if not crawl.success or not crawl.html:
+                logger.warning(f"Failed to fetch page: {url}")
+                return None
+
+            price = await asyncio.to_thread(_extract_price, crawl.html)
+
+            if price is None:
+                logger.warning(f"No price found for {url}")
+                return None
+
+            # Browser responses carry no usable validators; clearing the
+            # stored ones stops pointless conditional headers next cycle
+            return {"price": price, "etag": None, "last_modified": None}
+
         except Exception as e:
             logger.error(f"Error fetching price from {url}: {e}")
             return None
-    
-    def get_latest_price(self, product_id: int) -> Optional[Decimal]:
-        """Get the latest price from price_history for a product."""
+
+    async def _fetch_polite(self, get_crawler, url: str, etag: Optional[str],
+                            last_modified: Optional[str]) -> Optional[Dict]:
+        """fetch_price wrapped in the per-domain concurrency and pacing limits."""
+        domain = urlsplit(url).netloc
+        async with self._domain_sems[domain]:
+            delta = time.monotonic() - self._domain_last_hit.get(domain, 0.0)
+            if delta < self._domain_delay:
+                await asyncio.sleep(self._domain_delay - delta + random.uniform(0, 0.2))
+            self._domain_last_hit[domain] = time.monotonic()
+            return await self.fetch_price(get_crawler, url, etag, last_modified)
+
+    async def fetch_prices_batch(self, pages: List[tuple],
+                                 max_concurrency: Optional[int] = None) -> List[Optional[Dict]]:
+        """Scrape (url, etag, last_modified) tuples concurrently under a semaphore.
+
+        The Chromium crawler is started lazily and shared, so a run where
+        every page resolves on the static fast path never launches a browser.
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("SCRAPE_CONCURRENCY", "8"))
+
+        sem = asyncio.Semaphore(max_concurrency)
+        crawler: Optional[AsyncWebCrawler] = None
+        crawler_lock = asyncio.Lock()
+
+        async with AsyncExitStack() as stack:
+
+            async def get_crawler() -> AsyncWebCrawler:
+                nonlocal crawler
+                async with crawler_lock:
+                    if crawler is None:
+                        logger.info("Starting browser for JS-rendered pages")
+                        crawler = await stack.enter_async_context(
+                            AsyncWebCrawler(verbose=False)
+                        )
+                return crawler
+
+            async def fetch_one(url: str, etag: Optional[str],
+                                last_modified: Optional[str]) -> Optional[Dict]:
+                async with sem:
+                    return await self._fetch_polite(get_crawler, url, etag, last_modified)
+
+            return list(await asyncio.gather(*(fetch_one(*page) for page in pages)))
+
+    async def save_prices_batch(self, updates: List[Dict]) -> None:
+        """Persist one cycle's prices: one history insert plus one batched update."""
+        if not updates:
+            return
+
+        ids = [u["id"] for u in updates]
+        prices = [u["price"] for u in updates]
+        etags = [u.get("etag") for u in updates]
+        modified = [u.get("last_modified") for u in updates]
+
         try:
-            result = self.supabase.table("price_history").select("price").eq(
-                "product_id", product_id
-            ).order("scraped_at", desc=True).limit(1).execute()
-            
-            if result.data:
-                return Decimal(str(result.data[0]["price"]))
-            return None
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        "INSERT INTO price_history (product_id, price)"
+                        " SELECT id, price FROM unnest($1::bigint[], $2::float8[]) AS t(id, price)",
+                        ids, prices,
+                    )
+                    await conn.execute(
+                        "UPDATE products SET price = u.price,"
+                        " etag = u.etag, last_modified = u.last_modified"
+                        " FROM unnest($1::bigint[], $2::float8[], $3::text[], $4::text[])"
+                        " AS u(id, price, etag, last_modified)"
+                        " WHERE products.id = u.id",
+                        ids, prices, etags, modified,
+                    )
+
+            logger.debug(f"Saved prices for {len(updates)} products")
         except Exception as e:
-            logger.error(f"Error getting latest price for product {product_id}: {e}")
-            return None
-    
-    def save_price(self, product_id: int, price: Decimal) -> None:
-        """Save price to price_history and update products table."""
+            logger.error(f"Error saving prices: {e}")
+            raise
+
+    async def _record_alerts(self, alerted: List[tuple]) -> None:
+        """Stamp the alert-cooldown columns for products just alerted on."""
+        if not alerted:
+            return
         try:
-            # Insert into price_history
-            self.supabase.table("price_history").insert({
-                "product_id": product_id,
-                "price": float(price)
-            }).execute()
-            
-            # Update products.price
-            self.supabase.table("products").update({
-                "price": float(price)
-            }).eq("id", product_id).execute()
-            
-            logger.debug(f"Saved price {price} for product {product_id}")
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE products SET last_alert_at = NOW(), last_alert_price = u.price"
+                    " FROM unnest($1::bigint[], $2::float8[]) AS u(id, price)"
+                    " WHERE products.id = u.id",
+                    [pid for pid, _ in alerted], [price for _, price in alerted],
+                )
         except Exception as e:
-            logger.error(f"Error saving price for product {product_id}: {e}")
-            raise
-    
-    def send_telegram_alert(self, product_name: str, old_price: Decimal, new_price: Decimal, 
+            logger.error(f"Error recording alert cooldowns: {e}")
+
+
+    async def _post_telegram(self, payload: Dict) -> None:
+        """Send one bot message under the rate limiters, honoring a 429 once."""
+        url_api = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
+
+        # Encode once with orjson instead of letting httpx re-serialize the
+        # payload through stdlib json on every send (and on the retry)
+        content = orjson.dumps(payload)
+        headers = {"Content-Type": "application/json"}
+
+        async with self._tg_bot_limiter, self._tg_chat_limiter:
+            response = await self._http.post(url_api, content=content, headers=headers)
+
+        if response.status_code == 429:
+            retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+            async with self._tg_bot_limiter, self._tg_chat_limiter:
+                response = await self._http.post(url_api, content=content, headers=headers)
+
+        response.raise_for_status()
+
+    async def send_telegram_alert(self, product_name: str, old_price: float, new_price: float,
                            pct_change: float, url: str) -> None:
         """Send Telegram notification about price change."""
         emoji = "📈" if new_price > old_price else "📉"
-        
+
         message = (
             f"<b>{emoji}: {product_name}</b>\n\n"
             f"Old Price: RM {old_price:.2f}\n"
@@ -231,32 +489,28 @@ class GroceryPriceSentinel:
             f"Change: {pct_change:+.2f}%\n\n"
             f"[View Product]({url})"
         )
-        
-        url_api = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
+
         payload = {
             "chat_id": self.telegram_chat_id,
             "text": message,
             "disable_web_page_preview": False
         }
-        
+
         try:
-            response = httpx.post(url_api, json=payload, timeout=10)
-            response.raise_for_status()
+            await self._post_telegram(payload)
             logger.info(f"Sent Telegram alert for {product_name}")
         except Exception as e:
             logger.error(f"Telegram error: {e}")
             if hasattr(e, "response"):
                 logger.error(e.response.text)
     
-    def send_new_product_alert(self, product_name:str, url: str) -> None:
+    async def send_new_product_alert(self, product_name:str, url: str) -> None:
         message = (
             f"🆕 <b>New product added</b>\n\n"
             f"{product_name}\n\n"
             f"{url}"
         )
 
-        url_api = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
-
         payload = {
             "chat_id": self.telegram_chat_id,
             "text": message,
@@ -264,101 +518,176 @@ class GroceryPriceSentinel:
         }
 
         try:
-            httpx.post(url_api, json=payload, timeout=10).raise_for_status()
+            await self._post_telegram(payload)
             logger.info(f"Telegram new product alert sent: {product_name}")
         except Exception as e:
             logger.error(f"Telegram new product alert error: {e}")
 
-    def check_prices(self) -> None:
+    async def invalidate_backend_cache(self) -> None:
+        """Flush the dashboard API's response cache so it serves fresh prices."""
+        if not self.backend_base_url:
+            return
+        try:
+            response = await self._http.post(f"{self.backend_base_url}/cache/invalidate")
+            response.raise_for_status()
+            logger.debug("Backend response cache invalidated")
+        except Exception as e:
+            logger.warning(f"Could not invalidate backend cache: {e}")
+
+    async def check_prices(self) -> None:
         """Main function to check prices for all products."""
         logger.info("Starting price check...")
-        
-        # Get all products
+
+        # One aggregated read: every product plus its latest recorded price
+        # and alert-cooldown state, so no per-product lookups are needed later
         try:
-            result = self.supabase.table("products").select("id, name, url, price").execute()
-            products = result.data
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                products = await conn.fetch(
+                    "SELECT s.id, s.name, s.url, s.current_price,"
+                    " p.last_alert_at, p.last_alert_price, p.etag, p.last_modified"
+                    " FROM items_summary() s JOIN products p USING (id)"
+                )
         except Exception as e:
             logger.error(f"Error fetching products: {e}")
             raise
-        
+
         if not products:
             logger.warning("No products found in database")
             return
-        
+
         logger.info(f"Checking prices for {len(products)} products")
-        
-        checked_count = 0
-        changed_count = 0
+
+        results = await self.fetch_prices_batch(
+            [(p["url"], p["etag"], p["last_modified"]) for p in products]
+        )
+
         error_count = 0
-        
-        for product in products:
-            product_id = product["id"]
-            product_name = product["name"]
-            product_url = product["url"]
-            
-            logger.info(f"Checking {product_name}...")
-            
-            # Fetch current price
-            new_price = self.fetch_price(product_url)
-            
-            if new_price is None:
-                logger.warning(f"Could not fetch price for {product_name}")
+        unchanged_count = 0
+        checked: List[tuple] = []  # (product, new_price) for successful scrapes
+        updates: List[Dict] = []   # rows for save_prices_batch, incl. validators
+
+        for product, result in zip(products, results):
+            if result is None:
+                logger.warning(f"Could not fetch price for {product['name']}")
                 error_count += 1
                 continue
-            
-            # Get old price
-            old_price = self.get_latest_price(product_id)
-            
-            # Save new price
-            self.save_price(product_id, new_price)
-            checked_count += 1
-            
-            # Compare and alert if changed
-            if old_price is not None and old_price > 0:
-                price_diff = abs(new_price - old_price)
-                pct_change = ((new_price - old_price) / old_price) * 100
-                
-                # Check if change is significant
-                if price_diff > Decimal("0.01") and abs(pct_change) >= self.min_pct_change:
-                    self.send_telegram_alert(
-                        product_name, old_price, new_price, pct_change, product_url
-                    )
-                    changed_count += 1
-                    logger.info(
-                        f"Price changed for {product_name}: "
-                        f"RM {old_price:.2f} -> RM {new_price:.2f} ({pct_change:+.2f}%)"
-                    )
-                else:
-                    logger.debug(f"No significant price change for {product_name}")
-            else:
-                logger.info(f"Initial price recorded for {product_name}: RM {new_price:.2f}")
-        
+            if result.get("unchanged"):
+                # 304: the page byte-for-byte matches last cycle, so the
+                # stored price still stands and nothing needs writing
+                logger.debug(f"Page unchanged for {product['name']}")
+                unchanged_count += 1
+                continue
+            checked.append((product, result["price"]))
+            updates.append({
+                "id": product["id"],
+                "price": result["price"],
+                "etag": result["etag"],
+                "last_modified": result["last_modified"],
+            })
+
+        # Kick off the DB write now and let it overlap with deciding and
+        # sending alerts below; both only need the in-memory `checked` list
+        save_task = asyncio.ensure_future(self.save_prices_batch(updates))
+
+        # Old prices came along with the initial aggregated read; products
+        # without history become NaN and drop out of every comparison below
+        old = np.array(
+            [
+                p["current_price"] if p["current_price"] is not None else np.nan
+                for p, _ in checked
+            ],
+            dtype=np.float64,
+        )
+        new = np.array([price for _, price in checked], dtype=np.float64)
+
+        # One vectorized pass decides which products crossed the threshold
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.where(old > 0, (new - old) / old * 100.0, np.nan)
+            alert_mask = (np.abs(new - old) > MIN_PRICE_DIFF) & (np.abs(pct) >= self.min_pct_change)
+
+        for i in np.flatnonzero(np.isnan(old)):
+            product, new_price = checked[i]
+            logger.info(f"Initial price recorded for {product['name']}: RM {new_price:.2f}")
+
+        now = datetime.now(timezone.utc)
+        changed_count = 0
+        alerts = []
+        alerted: List[tuple] = []  # (product_id, new_price) to stamp below
+        for i in np.flatnonzero(alert_mask):
+            product, new_price = checked[i]
+            old_price = float(old[i])
+            pct_change = float(pct[i])
+
+            # Cooldown: a price still hovering within 1% of what we last
+            # alerted on is noise, not news
+            last_at = product["last_alert_at"]
+            last_price = product["last_alert_price"]
+            if (
+                last_at is not None
+                and last_price is not None
+                and (now - last_at).total_seconds() < self.alert_cooldown
+                and abs(new_price - float(last_price)) <= COOLDOWN_PRICE_TOLERANCE * float(last_price)
+            ):
+                logger.debug(f"Alert cooldown active for {product['name']}, skipping")
+                continue
+
+            alerts.append(self.send_telegram_alert(
+                product["name"], old_price, new_price, pct_change, product["url"]
+            ))
+            alerted.append((product["id"], new_price))
+            changed_count += 1
+            logger.info(
+                f"Price changed for {product['name']}: "
+                f"RM {old_price:.2f} -> RM {new_price:.2f} ({pct_change:+.2f}%)"
+            )
+
+        if alerts:
+            await asyncio.gather(*alerts)
+            await self._record_alerts(alerted)
+
+        await save_task
+
+        checked_count = len(checked)
         logger.info(
             f"Price check complete: {checked_count} checked, "
-            f"{changed_count} changed, {error_count} errors"
+            f"{unchanged_count} unchanged, {changed_count} changed, {error_count} errors"
         )
+
+        if checked_count:
+            await self.invalidate_backend_cache()
     
-    def run(self) -> None:
+    async def run(self) -> None:
         """Run the complete monitoring cycle."""
         try:
             # Step 1: Sync products from Google Sheets
-            self.sync_products_from_sheets()
-            
+            new_products = await self.sync_products_from_sheets()
+
+            if new_products:
+                await asyncio.gather(
+                    *(self.send_new_product_alert(name, url) for name, url in new_products)
+                )
+
             # Step 2: Check prices
-            self.check_prices()
-            
+            await self.check_prices()
+
             logger.info("Monitoring cycle completed successfully")
-        
+
         except Exception as e:
             logger.error(f"Fatal error in monitoring cycle: {e}")
             raise
+        finally:
+            if self._pool is not None:
+                await self._pool.close()
+            await self._http.aclose()
+            await self._scrape_http.aclose()
 
 
 def main():
     """Main entry point."""
     try:
         sentinel = GroceryPriceSentinel()
-        sentinel.run()
+        asyncio.run(sentinel.run())
         sys.exit(0)
     except Exception as e:
         logger.error(f"Application error: {e}")
@@ -7,10 +7,20 @@ CREATE TABLE IF NOT EXISTS products (
     name TEXT NOT NULL,
     url TEXT NOT NULL UNIQUE,
     price NUMERIC(10, 2),
+    last_alert_at TIMESTAMPTZ,
+    last_alert_price NUMERIC(10, 2),
+    etag TEXT,
+    last_modified TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Migrations for installs created before these columns existed
+ALTER TABLE products ADD COLUMN IF NOT EXISTS last_alert_at TIMESTAMPTZ;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS last_alert_price NUMERIC(10, 2);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS last_modified TEXT;
+
 -- Price history table: tracks price changes over time
 CREATE TABLE IF NOT EXISTS price_history (
     id BIGSERIAL PRIMARY KEY,
@@ -26,6 +36,42 @@ ON price_history(product_id, scraped_at DESC);
 -- Index for efficient product lookups by URL
 CREATE INDEX IF NOT EXISTS idx_products_url ON products(url);
 
+-- Aggregated summary used by GET /items and the scraper: latest price plus the
+-- most recent *different* price per product, in a single round trip. Both
+-- lateral subqueries are index-only scans on idx_price_history_product_scraped.
+CREATE OR REPLACE FUNCTION items_summary()
+RETURNS TABLE (
+    id BIGINT,
+    name TEXT,
+    url TEXT,
+    current_price NUMERIC,
+    previous_price NUMERIC,
+    last_updated TIMESTAMPTZ
+) AS $$
+    SELECT p.id,
+           p.name,
+           p.url,
+           latest.price AS current_price,
+           previous.price AS previous_price,
+           latest.scraped_at AS last_updated
+    FROM products p
+    LEFT JOIN LATERAL (
+        SELECT price, scraped_at
+        FROM price_history
+        WHERE product_id = p.id
+        ORDER BY scraped_at DESC
+        LIMIT 1
+    ) latest ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT price
+        FROM price_history
+        WHERE product_id = p.id AND price <> latest.price
+        ORDER BY scraped_at DESC
+        LIMIT 1
+    ) previous ON TRUE
+    ORDER BY p.name;
+$$ LANGUAGE sql STABLE;
+
 -- Trigger to update updated_at timestamp on products
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$